@@ -1,3 +1,4 @@
+import array
 import os
 import random
 import re
@@ -5,6 +6,7 @@ import sys
 
 DAMPING = 0.85
 SAMPLES = 10000
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
 
 
 def main():
@@ -30,24 +32,41 @@ def crawl(directory):
     pages = dict()
 
     # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".html"):
+                continue
+            with open(entry.path) as f:
+                contents = f.read()
+                links = LINK.findall(contents)
+                pages[entry.name] = set(links) - {entry.name}
 
     # Only include links to other pages in the corpus
     for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
+        pages[filename] &= pages.keys()
 
     return pages
 
 
+def index_corpus(corpus):
+    """
+    Flatten `corpus` into integer arrays.
+    Return a tuple `(pages, indptr, indices)` where `pages` is the sorted list
+    of page names, and the pages linked to by `pages[i]` are the indices
+    `indices[indptr[i]:indptr[i + 1]]`.
+    """
+    pages = sorted(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    indptr = array.array("i", [0])
+    indices = array.array("i")
+    for page in pages:
+        indices.extend(index[link] for link in corpus[page])
+        indptr.append(len(indices))
+
+    return pages, indptr, indices
+
+
 def transition_model(corpus, page, damping_factor):
     """
     Return a probability distribution over which page to visit next,
@@ -91,32 +110,28 @@ def sample_pagerank(corpus, damping_factor, n):
     PageRank values should sum to 1.
     """
 
-    # start sample count at 0
-    sample_count = corpus.copy()
-    for i in sample_count:
-        sample_count[i] = 0
-    sample = None
+    pages, indptr, indices = index_corpus(corpus)
+    page_num = len(pages)
+
+    # start sample count at 0, no previous sample so choosing randomly
+    sample_count = [0] * page_num
+    sample = random.randrange(page_num)
 
     # go through loop number of times _ thats what this means
     for _ in range(n):
-        if sample:
-            # previous sample is available, used transition model
-            tm = transition_model(corpus, sample, damping_factor)
-            tm_lst = list(tm.keys())
-            tm_weights = [tm[i] for i in tm]
-            sample = random.choices(tm_lst, tm_weights, k=1)[0]
-        else:
-            # no previous sample, choosing randomly
-            sample = random.choice(list(corpus.keys()))
-
         # count each sample
         sample_count[sample] += 1
 
-    # turn sample count to percentage
-    for i in sample_count:
-        sample_count[i] /= n
+        # follow a random link with probability `damping_factor`, otherwise
+        # (or if there are no links) choose randomly from all pages
+        start, end = indptr[sample], indptr[sample + 1]
+        if start < end and random.random() < damping_factor:
+            sample = indices[random.randrange(start, end)]
+        else:
+            sample = random.randrange(page_num)
 
-    return sample_count
+    # turn sample count to percentage
+    return {page: count / n for page, count in zip(pages, sample_count)}
 
 
 def iterate_pagerank(corpus, damping_factor):
@@ -127,37 +142,58 @@ def iterate_pagerank(corpus, damping_factor):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    page_num = len(corpus)
-    old_dict = {}
-    new_dict = {}
-
-    # assigning each page a rank of 1/page number
-    for page in corpus:
-        old_dict[page] = 1 / page_num
-
-    # repeatedly calculating new rank values basing on all of the current rank values
-    while True:
-        for page in corpus:
-            tmp = 0
-            for link_page in corpus:
-                # check if page links to our page
-                if page in corpus[link_page]:
-                    tmp += (old_dict[link_page] / len(corpus[link_page]))
-                # if page has no link
-                if len(corpus[link_page]) == 0:
-                    tmp += (old_dict[link_page]) / len(corpus)
-            tmp *= damping_factor
-            tmp += (1 - damping_factor) / page_num
-
-            new_dict[page] = tmp
-
-        diff = max([abs(new_dict[x] - old_dict[x]) for x in old_dict])
-        if diff < 0.001:
+    pages, indptr, indices = index_corpus(corpus)
+    page_num = len(pages)
+
+    # assigning each page a rank of 1/page number, with a residual holding
+    # the change the first full update would make to it
+    ranks = [1 / page_num] * page_num
+    residual = [(1 - damping_factor) / page_num - rank for rank in ranks]
+
+    def push(i, amount):
+        # pass `amount` of rank from page i on to the pages it links to, if it
+        # has no links return the share every page gets instead
+        start, end = indptr[i], indptr[i + 1]
+        if start == end:
+            return damping_factor * amount / page_num
+        share = damping_factor * amount / (end - start)
+        for link in indices[start:end]:
+            residual[link] += share
+        return 0
+
+    def spread(share):
+        # add the rank passed on by pages with no links to every page at once
+        if share:
+            for i in range(page_num):
+                residual[i] += share
+
+    dangling = 0
+    for i, rank in enumerate(ranks):
+        dangling += push(i, rank)
+    spread(dangling)
+
+    # only propagate changes: pages whose pending change is still large apply
+    # it and pass it on, until the total pending change, grown by the
+    # 1 / (1 - damping_factor) it would gain from being passed on, is below
+    # 0.001. With a damping factor of 1 that growth is unbounded and a
+    # periodic walk can keep its residual moving forever, so the growth is
+    # floored and the number of rounds is capped
+    tolerance = 0.001 * max(1 - damping_factor, 0.01) / page_num
+    for _ in range(10000):
+        active = [i for i in range(page_num) if abs(residual[i]) > tolerance]
+        if not active:
             break
-        else:
-            old_dict = new_dict.copy()
-
-    return old_dict
+        dangling = 0
+        for i in active:
+            change = residual[i]
+            residual[i] = 0
+            ranks[i] += change
+            dangling += push(i, change)
+        spread(dangling)
+
+    # the pending change left over is too small to apply, scale it back in
+    total = sum(ranks)
+    return {page: rank / total for page, rank in zip(pages, ranks)}
 
 
 if __name__ == "__main__":
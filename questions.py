@@ -1,13 +1,18 @@
 import nltk
 import sys
 import math
+import heapq
 from collections import Counter
-import glob
-import string
+from concurrent.futures import ProcessPoolExecutor
+import os
+import re
 
 
 FILE_MATCHES = 1
 SENTENCE_MATCHES = 1
+STOP_WORDS = frozenset(nltk.corpus.stopwords.words("english"))
+WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)*")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
 
 
 def main():
@@ -18,32 +23,43 @@ def main():
 
     # Calculate IDF values across files
     files = load_files(sys.argv[1])
-    file_words = {
-        filename: tokenize(files[filename])
-        for filename in files
-    }
+    if len(files) < 4:
+        # too few files to be worth starting worker processes
+        file_words = {
+            filename: tokenize(files[filename])
+            for filename in files
+        }
+    else:
+        # tokenize files in parallel, each file is independent
+        with ProcessPoolExecutor() as executor:
+            file_words = dict(zip(files, executor.map(tokenize, files.values())))
     file_idfs = compute_idfs(file_words)
+    file_index = index_words(file_words)
 
     # Prompt user for query
-    query = set(tokenize(input("Query: ")))
+    query = tokenize_set(input("Query: "))
 
     # Determine top file matches according to TF-IDF
-    filenames = top_files(query, file_words, file_idfs, n=FILE_MATCHES)
+    filenames = top_files(query, file_words, file_idfs, n=FILE_MATCHES, index=file_index)
 
     # Extract sentences from top files
     sentences = dict()
     for filename in filenames:
         for passage in files[filename].split("\n"):
-            for sentence in nltk.sent_tokenize(passage):
+            for sentence in SENTENCE_BREAK.split(passage):
                 tokens = tokenize(sentence)
                 if tokens:
                     sentences[sentence] = tokens
 
     # Compute IDF values across sentences
     idfs = compute_idfs(sentences)
+    sentence_counts = {
+        sentence: (Counter(words), 1 / len(words))
+        for sentence, words in sentences.items()
+    }
 
     # Determine top sentence matches
-    matches = top_sentences(query, sentences, idfs, n=SENTENCE_MATCHES)
+    matches = top_sentences(query, sentences, idfs, n=SENTENCE_MATCHES, counts=sentence_counts)
     for match in matches:
         print(match)
 
@@ -56,10 +72,12 @@ def load_files(directory):
     # Returns mapping for each txt file
     corpus = {}
 
-    for file_path in glob.glob(f"{directory}/*.txt"):
-        with open(file_path, "r", encoding='utf8') as file:
-            file_name = file_path.split("/")[-1]
-            corpus[file_name] = file.read()
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".txt"):
+                continue
+            with open(entry.path, "r", encoding='utf8') as file:
+                corpus[entry.name] = file.read()
 
     return corpus
 
@@ -72,17 +90,23 @@ def tokenize(document):
     Process document by coverting all words to lowercase, and removing any
     punctuation or English stopwords.
     """
-    punctuation = string.punctuation
-    stop_words = nltk.corpus.stopwords.words("english")
-
-    # Process document by coverting all words to lowercase
-    words = nltk.word_tokenize(document.lower())
-    # Removes any punctuation or English stopwords
-    words = [word for word in words if word not in punctuation and word not in stop_words]
+    # Process document by coverting all words to lowercase, the pattern
+    # never matches punctuation
+    words = WORD.findall(document.lower())
+    # Removes any English stopwords
+    words = [word for word in words if word not in STOP_WORDS]
 
     return words
 
 
+def tokenize_set(document):
+    """
+    Given a document (represented as a string), return the set of distinct
+    words in that document, processed the same way as `tokenize`.
+    """
+    return set(WORD.findall(document.lower())) - STOP_WORDS
+
+
 def compute_idfs(documents):
     """
     Given a dictionary of `documents` that maps names of documents to a list
@@ -95,51 +119,86 @@ def compute_idfs(documents):
     # of words, return a dictionary that maps words to their IDF values.
 
     N = len(documents)
-    word_counts = Counter(word for doc in documents.values() for word in doc)
+    # counts the number of documents each word appears in, once per document
+    word_counts = Counter()
+    for doc in documents.values():
+        word_counts.update(set(doc))
     idf = {}
-    # Gets at least one of the documents from dictionary
 
     for word, count in word_counts.items():
         idf[word] = math.log(N / count)
     return idf
 
 
-def top_files(query, files, idfs, n):
+def index_words(documents):
+    """
+    Given a dictionary of `documents` that maps names of documents to a list
+    of words, return a dictionary that maps each word to a dictionary of the
+    names of the documents containing it and how many times it appears there.
+    """
+    index = {}
+
+    for name, words in documents.items():
+        for word, count in Counter(words).items():
+            index.setdefault(word, {})[name] = count
+    return index
+
+
+def top_files(query, files, idfs, n, index=None):
     """
     Given a `query` (a set of words), `files` (a dictionary mapping names of
     files to a list of their words), and `idfs` (a dictionary mapping words
     to their IDF values), return a list of the filenames of the the `n` top
     files that match the query, ranked according to tf-idf.
+
+    `index` is the result of `index_words(files)`, pass it to avoid
+    rebuilding it for every query.
     """
-    # uses a dictionary comprehension to calculate the scores for each file in one line, rather than a loop
-    scores = {filename: sum(idfs.get(word, 0) * filecontent.count(word)
-                            for word in query if word in filecontent) for filename, filecontent in files.items()}
-    return sorted(scores, key=scores.get, reverse=True)[:n]
+    if index is None:
+        index = index_words(files)
+
+    # starts every file at 0 in file order, so ties keep that order, then
+    # only visits the files that contain a query word
+    scores = dict.fromkeys(files, 0)
+    for word in query:
+        for filename, count in index.get(word, {}).items():
+            scores[filename] += idfs.get(word, 0) * count
+    return heapq.nlargest(n, scores, key=scores.get)
 
 
-def top_sentences(query, sentences, idfs, n):
+def top_sentences(query, sentences, idfs, n, counts=None):
     """
     Given a `query` (a set of words), `sentences` (a dictionary mapping
     sentences to a list of their words), and `idfs` (a dictionary mapping words
     to their IDF values), return a list of the `n` top sentences that match
     the query, ranked according to idf. If there are ties, preference should
     be given to sentences that have a higher query term density.
+
+    `counts` maps sentences to a Counter of their words and the reciprocal of
+    their length, pass it to avoid recounting them.
     """
+    if counts is None:
+        counts = {
+            sentence: (Counter(words), 1 / len(words))
+            for sentence, words in sentences.items()
+        }
+
     sentence_scores = list()
 
     for sentence in sentences:
         sentence_val = [sentence, 0, 0]
+        word_counts, inverse_length = counts[sentence]
 
         for word in query:
-            if word in sentences[sentence]:
+            if word in word_counts:
                 # Compute “matching word measure”
                 sentence_val[1] += idfs[word]
                 # Compute "query term density"
-                sentence_val[2] += sentences[sentence].count(word) / len(sentences[sentence])
+                sentence_val[2] += word_counts[word] * inverse_length
 
         sentence_scores.append(sentence_val)
 
-    return [sentence for sentence, mwm, qtd in sorted(sentence_scores, key=lambda item: (item[1], item[2]), reverse=True)][:n]
+    return [sentence for sentence, mwm, qtd in heapq.nlargest(n, sentence_scores, key=lambda item: (item[1], item[2]))]
 
 
 if __name__ == "__main__":